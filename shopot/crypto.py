@@ -1,21 +1,35 @@
 """Encryption helpers for Shopot documents."""
 from __future__ import annotations
 
-import base64
+import binascii
+import functools
 import hashlib
 import hmac
 import os
+import struct
 from dataclasses import dataclass
 
 
 PBKDF2_ITERATIONS = 200_000
 SALT_SIZE = 16
 NONCE_SIZE = 16
+KEY_CACHE_SIZE = 32
+
+_DIGEST_SIZE = hashlib.sha512().digest_size
+_pack_counter = struct.Struct(">Q").pack
+
+
+def _b64encode(value: bytes) -> str:
+    return binascii.b2a_base64(value, newline=False).decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return binascii.a2b_base64(value)
 
 
 @dataclass
 class EncryptedPayload:
-    """Payload format for the modern encryption schemes (versions 2 and 3)."""
+    """Payload format for the modern encryption schemes (versions 2 to 4)."""
 
     salt: bytes
     nonce: bytes
@@ -24,19 +38,19 @@ class EncryptedPayload:
 
     def to_dict(self) -> dict[str, str]:
         return {
-            "salt": base64.b64encode(self.salt).decode("ascii"),
-            "nonce": base64.b64encode(self.nonce).decode("ascii"),
-            "ciphertext": base64.b64encode(self.ciphertext).decode("ascii"),
-            "mac": base64.b64encode(self.mac).decode("ascii"),
+            "salt": _b64encode(self.salt),
+            "nonce": _b64encode(self.nonce),
+            "ciphertext": _b64encode(self.ciphertext),
+            "mac": _b64encode(self.mac),
         }
 
     @classmethod
     def from_dict(cls, data: dict[str, str]) -> "EncryptedPayload":
         return cls(
-            salt=base64.b64decode(data["salt"]),
-            nonce=base64.b64decode(data["nonce"]),
-            ciphertext=base64.b64decode(data["ciphertext"]),
-            mac=base64.b64decode(data["mac"]),
+            salt=_b64decode(data["salt"]),
+            nonce=_b64decode(data["nonce"]),
+            ciphertext=_b64decode(data["ciphertext"]),
+            mac=_b64decode(data["mac"]),
         )
 
 
@@ -49,19 +63,22 @@ class LegacyEncryptedPayload:
 
     def to_dict(self) -> dict[str, str]:
         return {
-            "salt": base64.b64encode(self.salt).decode("ascii"),
-            "ciphertext": base64.b64encode(self.ciphertext).decode("ascii"),
+            "salt": _b64encode(self.salt),
+            "ciphertext": _b64encode(self.ciphertext),
         }
 
     @classmethod
     def from_dict(cls, data: dict[str, str]) -> "LegacyEncryptedPayload":
         return cls(
-            salt=base64.b64decode(data["salt"]),
-            ciphertext=base64.b64decode(data["ciphertext"]),
+            salt=_b64decode(data["salt"]),
+            ciphertext=_b64decode(data["ciphertext"]),
         )
 
 
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
 def _derive_keys(key_material: str, salt: bytes) -> tuple[bytes, bytes]:
+    # Cached so that reopening or re-saving a document within a session does
+    # not repeat the PBKDF2 work; call clear_key_cache() to drop the secrets.
     derived = hashlib.pbkdf2_hmac(
         "sha256",
         key_material.encode("utf-8"),
@@ -72,6 +89,18 @@ def _derive_keys(key_material: str, salt: bytes) -> tuple[bytes, bytes]:
     return derived[:32], derived[32:]
 
 
+@functools.lru_cache(maxsize=8)
+def _material_digest(key_material: str) -> bytes:
+    return hashlib.sha512(_material_bytes(key_material)).digest()
+
+
+def clear_key_cache() -> None:
+    """Forget every derived key and key digest remembered by this process."""
+
+    _derive_keys.cache_clear()
+    _material_digest.cache_clear()
+
+
 def _material_bytes(key_material: str) -> bytes:
     material = key_material.encode("utf-8")
     if not material:
@@ -79,15 +108,49 @@ def _material_bytes(key_material: str) -> bytes:
     return material
 
 
+def _xor_bytes(data: bytes, keystream: bytes) -> bytes:
+    """XOR ``data`` with the leading ``len(data)`` bytes of ``keystream``."""
+
+    length = len(data)
+    if length < 64:
+        return bytes(d ^ k for d, k in zip(data, keystream))
+    left = int.from_bytes(data, "big")
+    right = int.from_bytes(keystream[:length], "big")
+    return (left ^ right).to_bytes(length, "big")
+
+
+def _salt_and_nonce() -> tuple[bytes, bytes]:
+    random_bytes = os.urandom(SALT_SIZE + NONCE_SIZE)
+    return random_bytes[:SALT_SIZE], random_bytes[SALT_SIZE:]
+
+
+def _authenticate(mac_key: bytes, *parts: bytes) -> bytes:
+    mac = hmac.new(mac_key, digestmod=hashlib.sha256)
+    for part in parts:
+        mac.update(part)
+    return mac.digest()
+
+
+def _block_count(length: int) -> int:
+    return -(-length // _DIGEST_SIZE)
+
+
 def _keystream_v2(key: bytes, nonce: bytes, length: int) -> bytes:
-    counter = 0
-    stream = bytearray()
-    while len(stream) < length:
-        counter_bytes = counter.to_bytes(8, "big")
-        digest = hmac.new(key, nonce + counter_bytes, hashlib.sha512).digest()
-        stream.extend(digest)
-        counter += 1
-    return bytes(stream[:length])
+    if length == 0:
+        return b""
+    # The keyed state (and the constant nonce prefix) is hashed once and
+    # cloned per block rather than re-deriving the HMAC pads every time.
+    keyed = hmac.new(key, nonce, hashlib.sha512)
+    blocks = _block_count(length)
+    stream = bytearray(blocks * _DIGEST_SIZE)
+    for counter in range(blocks):
+        counter_bytes = _pack_counter(counter)
+        block = keyed.copy()
+        block.update(counter_bytes)
+        offset = counter * _DIGEST_SIZE
+        stream[offset : offset + _DIGEST_SIZE] = block.digest()
+    del stream[length:]
+    return bytes(stream)
 
 
 def _keystream_v3(
@@ -100,93 +163,135 @@ def _keystream_v3(
     material_len = len(material)
     if material_len == 0:
         raise ValueError("Key material must not be empty")
-
-    stream = bytearray()
-    counter = 0
-    while len(stream) < length:
-        counter_bytes = counter.to_bytes(8, "big")
+    if length == 0:
+        return b""
+
+    keyed = hmac.new(key, salt + nonce, hashlib.sha512)
+    material_view = memoryview(material)
+    blocks = _block_count(length)
+    stream = bytearray(blocks * _DIGEST_SIZE)
+    for counter in range(blocks):
+        counter_bytes = _pack_counter(counter)
         rotation = counter % material_len
-        rotated = material[rotation:] + material[:rotation]
-        digest_input = salt + nonce + counter_bytes + rotated
-        digest = hmac.new(key, digest_input, hashlib.sha512).digest()
-        stream.extend(digest)
-        counter += 1
-    return bytes(stream[:length])
+        block = keyed.copy()
+        block.update(counter_bytes)
+        block.update(material_view[rotation:])
+        block.update(material_view[:rotation])
+        offset = counter * _DIGEST_SIZE
+        stream[offset : offset + _DIGEST_SIZE] = block.digest()
+    del stream[length:]
+    return bytes(stream)
+
+
+def _keystream_v4(
+    key: bytes,
+    salt: bytes,
+    nonce: bytes,
+    material: bytes,
+    length: int,
+) -> bytes:
+    if not material:
+        raise ValueError("Key material must not be empty")
+    if length == 0:
+        return b""
+    return hashlib.shake_256(key + salt + nonce + material).digest(length)
 
 
 def encrypt_v2(plaintext: bytes, key_material: str) -> EncryptedPayload:
-    salt = os.urandom(SALT_SIZE)
-    nonce = os.urandom(NONCE_SIZE)
+    salt, nonce = _salt_and_nonce()
     enc_key, mac_key = _derive_keys(key_material, salt)
     keystream = _keystream_v2(enc_key, nonce, len(plaintext))
-    ciphertext = bytes(p ^ k for p, k in zip(plaintext, keystream))
-    mac = hmac.new(mac_key, nonce + ciphertext, hashlib.sha256).digest()
+    ciphertext = _xor_bytes(plaintext, keystream)
+    mac = _authenticate(mac_key, nonce, ciphertext)
     return EncryptedPayload(salt=salt, nonce=nonce, ciphertext=ciphertext, mac=mac)
 
 
 def decrypt_v2(payload: EncryptedPayload, key_material: str) -> bytes:
     enc_key, mac_key = _derive_keys(key_material, payload.salt)
-    expected_mac = hmac.new(
-        mac_key, payload.nonce + payload.ciphertext, hashlib.sha256
-    ).digest()
+    expected_mac = _authenticate(mac_key, payload.nonce, payload.ciphertext)
     if not hmac.compare_digest(expected_mac, payload.mac):
         raise ValueError("Encrypted payload authentication failed")
     keystream = _keystream_v2(enc_key, payload.nonce, len(payload.ciphertext))
-    return bytes(c ^ k for c, k in zip(payload.ciphertext, keystream))
+    return _xor_bytes(payload.ciphertext, keystream)
 
 
-def encrypt(plaintext: bytes, key_material: str) -> EncryptedPayload:
-    salt = os.urandom(SALT_SIZE)
-    nonce = os.urandom(NONCE_SIZE)
+def encrypt_v3(plaintext: bytes, key_material: str) -> EncryptedPayload:
+    salt, nonce = _salt_and_nonce()
     material = _material_bytes(key_material)
     enc_key, mac_key = _derive_keys(key_material, salt)
     keystream = _keystream_v3(enc_key, salt, nonce, material, len(plaintext))
-    ciphertext = bytes(p ^ k for p, k in zip(plaintext, keystream))
-    material_digest = hashlib.sha512(material).digest()
-    mac = hmac.new(
-        mac_key, salt + nonce + ciphertext + material_digest, hashlib.sha256
-    ).digest()
+    ciphertext = _xor_bytes(plaintext, keystream)
+    material_digest = _material_digest(key_material)
+    mac = _authenticate(mac_key, salt, nonce, ciphertext, material_digest)
     return EncryptedPayload(salt=salt, nonce=nonce, ciphertext=ciphertext, mac=mac)
 
 
-def decrypt(payload: EncryptedPayload, key_material: str) -> bytes:
+def decrypt_v3(payload: EncryptedPayload, key_material: str) -> bytes:
     material = _material_bytes(key_material)
     enc_key, mac_key = _derive_keys(key_material, payload.salt)
-    material_digest = hashlib.sha512(material).digest()
-    expected_mac = hmac.new(
-        mac_key,
-        payload.salt + payload.nonce + payload.ciphertext + material_digest,
-        hashlib.sha256,
-    ).digest()
+    material_digest = _material_digest(key_material)
+    expected_mac = _authenticate(
+        mac_key, payload.salt, payload.nonce, payload.ciphertext, material_digest
+    )
     if not hmac.compare_digest(expected_mac, payload.mac):
         raise ValueError("Encrypted payload authentication failed")
     keystream = _keystream_v3(
         enc_key, payload.salt, payload.nonce, material, len(payload.ciphertext)
     )
-    return bytes(c ^ k for c, k in zip(payload.ciphertext, keystream))
+    return _xor_bytes(payload.ciphertext, keystream)
+
+
+def encrypt(plaintext: bytes, key_material: str) -> EncryptedPayload:
+    salt, nonce = _salt_and_nonce()
+    material = _material_bytes(key_material)
+    enc_key, mac_key = _derive_keys(key_material, salt)
+    keystream = _keystream_v4(enc_key, salt, nonce, material, len(plaintext))
+    ciphertext = _xor_bytes(plaintext, keystream)
+    material_digest = _material_digest(key_material)
+    mac = _authenticate(mac_key, salt, nonce, ciphertext, material_digest)
+    return EncryptedPayload(salt=salt, nonce=nonce, ciphertext=ciphertext, mac=mac)
+
+
+def decrypt(payload: EncryptedPayload, key_material: str) -> bytes:
+    material = _material_bytes(key_material)
+    enc_key, mac_key = _derive_keys(key_material, payload.salt)
+    material_digest = _material_digest(key_material)
+    expected_mac = _authenticate(
+        mac_key, payload.salt, payload.nonce, payload.ciphertext, material_digest
+    )
+    if not hmac.compare_digest(expected_mac, payload.mac):
+        raise ValueError("Encrypted payload authentication failed")
+    keystream = _keystream_v4(
+        enc_key, payload.salt, payload.nonce, material, len(payload.ciphertext)
+    )
+    return _xor_bytes(payload.ciphertext, keystream)
+
+
+def _keystream_legacy(seed: bytes, length: int) -> bytes:
+    if length == 0:
+        return b""
+    seeded = hashlib.sha512(seed)
+    blocks = _block_count(length)
+    keystream = bytearray(blocks * _DIGEST_SIZE)
+    for counter in range(blocks):
+        counter_bytes = _pack_counter(counter)
+        block = seeded.copy()
+        block.update(counter_bytes)
+        offset = counter * _DIGEST_SIZE
+        keystream[offset : offset + _DIGEST_SIZE] = block.digest()
+    del keystream[length:]
+    return bytes(keystream)
 
 
 def encrypt_legacy(plaintext: bytes, key_material: str) -> LegacyEncryptedPayload:
     salt = os.urandom(16)
     seed = hashlib.sha256(key_material.encode("utf-8") + salt).digest()
-    keystream = bytearray()
-    counter = 0
-    while len(keystream) < len(plaintext):
-        counter_bytes = counter.to_bytes(8, "big")
-        digest = hashlib.sha512(seed + counter_bytes).digest()
-        keystream.extend(digest)
-        counter += 1
-    ciphertext = bytes(p ^ k for p, k in zip(plaintext, keystream[: len(plaintext)]))
+    keystream = _keystream_legacy(seed, len(plaintext))
+    ciphertext = _xor_bytes(plaintext, keystream)
     return LegacyEncryptedPayload(salt=salt, ciphertext=ciphertext)
 
 
 def decrypt_legacy(payload: LegacyEncryptedPayload, key_material: str) -> bytes:
     seed = hashlib.sha256(key_material.encode("utf-8") + payload.salt).digest()
-    keystream = bytearray()
-    counter = 0
-    while len(keystream) < len(payload.ciphertext):
-        counter_bytes = counter.to_bytes(8, "big")
-        digest = hashlib.sha512(seed + counter_bytes).digest()
-        keystream.extend(digest)
-        counter += 1
-    return bytes(c ^ k for c, k in zip(payload.ciphertext, keystream[: len(payload.ciphertext)]))
+    keystream = _keystream_legacy(seed, len(payload.ciphertext))
+    return _xor_bytes(payload.ciphertext, keystream)
@@ -11,6 +11,7 @@ from .crypto import (
     decrypt,
     decrypt_legacy,
     decrypt_v2,
+    decrypt_v3,
     encrypt,
 )
 
@@ -30,14 +31,14 @@ class ShopotDocument:
     def save(self, path: str | Path, key_material: str) -> None:
         payload = self.encrypt(key_material)
         data = {
-            "version": 3,
+            "version": 4,
             "payload": payload.to_dict(),
         }
-        Path(path).write_text(json.dumps(data))
+        Path(path).write_bytes(json.dumps(data).encode("ascii"))
 
     @classmethod
     def load(cls, path: str | Path, key_material: str) -> "ShopotDocument":
-        data = json.loads(Path(path).read_text())
+        data = json.loads(Path(path).read_bytes())
         version = data.get("version", 1)
         payload_data = data["payload"]
 
@@ -50,6 +51,10 @@ class ShopotDocument:
             plaintext = decrypt_v2(payload, key_material)
             return cls(text=plaintext.decode("utf-8"))
         if version == 3:
+            payload = EncryptedPayload.from_dict(payload_data)
+            plaintext = decrypt_v3(payload, key_material)
+            return cls(text=plaintext.decode("utf-8"))
+        if version == 4:
             payload = EncryptedPayload.from_dict(payload_data)
             return cls.decrypt(payload, key_material)
 
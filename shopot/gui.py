@@ -2,36 +2,69 @@
 from __future__ import annotations
 
 import base64
+import functools
+import hashlib
 import io
 import math
 import mimetypes
 import re
 import tkinter as tk
 import tkinter.font as tkfont
-from dataclasses import dataclass
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 from tkinter import filedialog, messagebox, simpledialog, ttk
-from typing import cast
+from typing import TYPE_CHECKING, Callable, TypeVar, cast
 
-try:  # pragma: no cover - optional dependency
+from .crypto import clear_key_cache
+from .document import ShopotDocument
+from .keyfiles import KeyArray
+from .passwords import password_to_key_material, validate_password
+
+# Pillow is imported by _load_pil() on first use, as it is only needed once
+# an image is added or a document with images is opened.
+if TYPE_CHECKING:
     from PIL import Image, ImageOps, ImageTk
+else:
+    Image = ImageOps = ImageTk = None
+
+try:  # pragma: no cover - optional dependency
+    import pybase64 as _b64
 
-    _PIL_AVAILABLE = True
-except Exception:  # pragma: no cover - Pillow not installed
-    Image = ImageOps = ImageTk = None  # type: ignore[assignment]
-    _PIL_AVAILABLE = False
+    _b64encode_text = _b64.b64encode_as_string
+except Exception:  # pragma: no cover - pybase64 not installed
+    _b64 = base64
 
-if _PIL_AVAILABLE:  # pragma: no cover - optional plugin
+    def _b64encode_text(data: bytes) -> str:
+        return base64.b64encode(data).decode("ascii")
+
+
+def _b64decode_data(value: str) -> bytes:
+    # Strict decoding takes the fast path for the unwrapped base64 this app
+    # writes; anything else is decoded leniently, as it always was.
     try:
+        return _b64.b64decode(value, validate=True)
+    except ValueError:
+        return _b64.b64decode(value)
+
+
+@functools.cache
+def _load_pil() -> bool:
+    """Import Pillow (and the HEIF plugin) on first call; report whether it is available."""
+
+    global Image, ImageOps, ImageTk
+    try:  # pragma: no cover - optional dependency
+        from PIL import Image, ImageOps, ImageTk
+    except Exception:  # pragma: no cover - Pillow not installed
+        return False
+    try:  # pragma: no cover - optional plugin
         from pillow_heif import register_heif_opener  # type: ignore
 
         register_heif_opener()
     except Exception:
         pass
-
-from .document import ShopotDocument
-from .keyfiles import KeyArray
-from .passwords import password_to_key_material, validate_password
+    return True
 
 
 for _ext, _mime in (
@@ -44,6 +77,11 @@ for _ext, _mime in (
 
 IMAGE_HEADER_PREFIX = "::image::"
 IMAGE_FOOTER = "::end-image::"
+_IMAGE_PREFIX_LEN = len(IMAGE_HEADER_PREFIX)
+_IMAGE_FOOTER_TOKEN = f"\n{IMAGE_FOOTER}"
+_IMAGE_FOOTER_LINE = f"{_IMAGE_FOOTER_TOKEN}\n"
+
+_CAPTION_KEYS = frozenset({"caption", "caption64"})
 
 _STATIC_IMAGE_MIMES = {
     "image/png",
@@ -61,8 +99,42 @@ _BOLD_ITALIC_PATTERN = re.compile(r"(?<!\*)\*\*\*(.+?)\*\*\*(?!\*)")
 _BOLD_PATTERN = re.compile(r"(?<!\*)\*\*(.+?)\*\*(?!\*)")
 _ITALIC_PATTERN = re.compile(r"(?<!\*)\*(.+?)\*(?!\*)")
 
+_INLINE_PATTERNS = (
+    ("bolditalic", _BOLD_ITALIC_PATTERN),
+    ("bold", _BOLD_PATTERN),
+    ("italic", _ITALIC_PATTERN),
+)
+
 _SUPPORTED_IMAGE_MIMES = _STATIC_IMAGE_MIMES | {_GIF_MIME}
 
+# ``\w`` matches exactly the characters for which ``str.isalnum`` holds, plus "_".
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w-]")
+
+_DOCUMENT_FILETYPES = (("Shopot Document", "*.shpt"), ("All Files", "*"))
+_KEY_ARRAY_FILETYPES = (("Shopot Key Array", "*.shptk"), ("All Files", "*"))
+_IMAGE_FILETYPES = (
+    ("Image files", "*.png *.gif *.jpg *.jpeg *.webp *.heic *.heif"),
+    ("PNG", "*.png"),
+    ("GIF", "*.gif"),
+    ("JPEG", "*.jpg *.jpeg"),
+    ("WebP", "*.webp"),
+    ("HEIC/HEIF", "*.heic *.heif"),
+    ("All Files", "*"),
+)
+
+BACKGROUND_POLL_MS = 30
+# Typing re-tags the edited lines once the keyboard has been quiet this long.
+TAG_REFRESH_DELAY_MS = 50
+
+# Base64 is decoded in slices of whole 4-character groups (3 MiB of output
+# each) so exporting a large image never holds a second full-size copy.
+_BASE64_CHUNK_CHARS = 4 * 1024 * 1024
+# Anything outside the base64 alphabet (line breaks in hand-edited payloads)
+# is dropped before slicing so the slices stay aligned to whole groups.
+_NON_BASE64_CHARS = re.compile(r"[^A-Za-z0-9+/=]")
+
+_T = TypeVar("_T")
+
 
 class _PasswordDialog(simpledialog.Dialog):
     """Modal dialog that constrains password input to 10 numeric characters."""
@@ -102,6 +174,33 @@ class ImageBlockData:
     mime: str
     data: str
     caption: str
+    # SHA-1 of ``data``, identifying the payload in the editor's photo pool.
+    digest: bytes | None = field(default=None, repr=False, compare=False)
+    # A Pillow image already scaled on the worker thread, with the
+    # ``(max_width, max_height)`` bounds it was scaled for.
+    preview: tuple[int, int, Image.Image] | None = field(default=None, repr=False, compare=False)
+
+    def decoded(self) -> bytes:
+        """Return the decoded image bytes.
+
+        The result is deliberately not cached on the block: keeping it would
+        hold every image twice, as base64 and decoded, for as long as the
+        document is open. Callers that need the bytes decode them once and
+        use them locally.
+        """
+
+        return _b64decode_data(self.data)
+
+    def payload_digest(self) -> bytes:
+        """Return the digest of ``data``, hashing it on first use."""
+
+        if self.digest is None:
+            self.digest = hashlib.sha1(self.data.encode("ascii")).digest()
+        return self.digest
+
+
+_PhotoKey = tuple[str, bytes, int, int]
+_PhotoEntry = tuple[tk.PhotoImage, list[tk.PhotoImage] | None, list[int] | None]
 
 
 @dataclass
@@ -117,28 +216,63 @@ class ImageWidget:
     delays: list[int] | None = None
     current_frame: int = 0
     after_id: str | None = None
+    pool_key: _PhotoKey | None = None
+
+
+@functools.lru_cache(maxsize=64)
+def _guess_image_mime(suffix: str) -> str | None:
+    mime, _ = mimetypes.guess_type(f"image{suffix.lower()}")
+    return mime
+
+
+@functools.lru_cache(maxsize=64)
+def _guess_image_extension(mime: str) -> str:
+    ext = mimetypes.guess_extension(mime) or ".img"
+    if ext == ".jpe":
+        ext = ".jpg"
+    return ext
 
 
 def _encode_caption(value: str) -> str:
-    return base64.b64encode(value.encode("utf-8")).decode("ascii")
+    return urllib.parse.quote(value, safe="")
 
 
 def _decode_caption(value: str) -> str:
+    return urllib.parse.unquote(value)
+
+
+def _decode_caption64(value: str) -> str:
+    """Decode the base64 caption field written by older Shopot versions."""
+
     try:
-        return base64.b64decode(value.encode("ascii")).decode("utf-8")
+        return _b64.b64decode(value).decode("utf-8")
     except Exception:
         return value
 
 
 def _build_image_header(block: ImageBlockData) -> str:
-    caption64 = _encode_caption(block.caption)
-    return f"{IMAGE_HEADER_PREFIX}mime={block.mime};caption64={caption64}"
-
-
-def _parse_image_header(line: str) -> ImageBlockData | None:
-    if not line.startswith(IMAGE_HEADER_PREFIX):
-        return None
-    content = line[len(IMAGE_HEADER_PREFIX) :]
+    caption = _encode_caption(block.caption)
+    return f"{IMAGE_HEADER_PREFIX}mime={block.mime};caption={caption}"
+
+
+def _parse_image_header_fields(content: str) -> ImageBlockData | None:
+    """Parse the ``key=value`` fields that follow ``IMAGE_HEADER_PREFIX``."""
+
+    # The layouts written by this app (``mime=...`` optionally followed by a
+    # single caption field) are split with ``partition``; anything else goes
+    # through the general ``key=value`` parser below.
+    head, _, rest = content.partition(";")
+    key, _, head_mime = head.partition("=")
+    if key == "mime" and ";" not in rest:
+        caption_key, _, caption_value = rest.partition("=")
+        if not rest or caption_key in _CAPTION_KEYS:
+            if not head_mime:
+                return None
+            if caption_key == "caption":
+                caption = _decode_caption(caption_value)
+            else:
+                caption = _decode_caption64(caption_value)
+            return ImageBlockData(mime=head_mime, data="", caption=caption)
     parts = content.split(";")
     values: dict[str, str] = {}
     for part in parts:
@@ -147,13 +281,127 @@ def _parse_image_header(line: str) -> ImageBlockData | None:
         key, value = part.split("=", 1)
         values[key] = value
     mime = values.get("mime")
-    caption64 = values.get("caption64", "")
     if not mime:
         return None
-    caption = _decode_caption(caption64)
+    if "caption" in values:
+        caption = _decode_caption(values["caption"])
+    else:
+        caption = _decode_caption64(values.get("caption64", ""))
     return ImageBlockData(mime=mime, data="", caption=caption)
 
 
+def _parse_document_text(text: str) -> list[tuple[str, str | ImageBlockData]]:
+    if IMAGE_HEADER_PREFIX not in text:
+        return [("text", text)] if text else []
+    segments: list[tuple[str, str | ImageBlockData]] = []
+    pos = 0
+    # Blocks are located with str.find, which scans in C; a regex spanning
+    # the payload would step through every base64 character.
+    while True:
+        start = text.find(IMAGE_HEADER_PREFIX, pos)
+        if start == -1:
+            if pos < len(text):
+                segments.append(("text", text[pos:]))
+            break
+        if start > pos:
+            segments.append(("text", text[pos:start]))
+        header_end = text.find("\n", start)
+        if header_end == -1:
+            segments.append(("text", text[start:]))
+            break
+        data_start = header_end + 1
+        footer_pos = text.find(_IMAGE_FOOTER_TOKEN, data_start)
+        if footer_pos == -1:
+            segments.append(("text", text[start:]))
+            break
+        pos = footer_pos + len(_IMAGE_FOOTER_TOKEN)
+        if text.startswith("\n", pos):
+            pos += 1
+        block = _parse_image_header_fields(text[start + _IMAGE_PREFIX_LEN : header_end])
+        if block is None:
+            segments.append(("text", text[start:pos]))
+            continue
+        block.data = text[data_start:footer_pos].strip()
+        segments.append(("image", block))
+    return segments
+
+
+def _load_preview_image(
+    block: ImageBlockData, max_width: int, max_height: int, raw: bytes | None = None
+) -> Image.Image:
+    """Decode ``block`` (or its already decoded ``raw`` bytes) with Pillow and scale it to fit."""
+
+    if raw is None:
+        try:
+            raw = block.decoded()
+        except Exception as exc:  # pragma: no cover - malformed base64
+            raise RuntimeError("Embedded image data is not valid base64.") from exc
+
+    try:
+        image = Image.open(io.BytesIO(raw))
+    except Exception as exc:  # pragma: no cover - unsupported format
+        if block.mime in {"image/heic", "image/heif"}:
+            raise RuntimeError(
+                "HEIC/HEIF preview requires Pillow with HEIF support (e.g., install pillow-heif)."
+            ) from exc
+        raise RuntimeError(str(exc)) from exc
+
+    # Let JPEG decode at a reduced scale before anything loads the pixels.
+    # The bound is square because EXIF rotation may still swap the axes.
+    bound = max(max_width, max_height)
+    try:
+        image.draft(None, (bound, bound))
+    except Exception:
+        pass
+
+    try:
+        if ImageOps is not None:
+            image = ImageOps.exif_transpose(image)
+    except Exception:
+        pass
+
+    if image.mode not in {"RGB", "RGBA"}:
+        image = image.convert("RGBA")
+
+    image.thumbnail((max_width, max_height), Image.LANCZOS)
+    return image
+
+
+def _prepare_images(
+    segments: list[tuple[str, str | ImageBlockData]],
+    bounds: tuple[int, int],
+    pooled: frozenset[_PhotoKey] = frozenset(),
+) -> None:
+    """Decode and scale image payloads ahead of rendering so the Tk thread can skip it."""
+
+    for kind, payload in segments:
+        if kind == "image":
+            _prepare_image_block(cast(ImageBlockData, payload), bounds, pooled=pooled)
+
+
+def _prepare_image_block(
+    block: ImageBlockData,
+    bounds: tuple[int, int],
+    raw: bytes | None = None,
+    *,
+    pooled: frozenset[_PhotoKey] = frozenset(),
+) -> None:
+    # Hashing multi-megabyte payloads belongs here rather than on the Tk
+    # thread, where the photo pool looks them up.
+    digest = block.payload_digest()
+    # Only Pillow previews need the decoded bytes here. Without Pillow, and
+    # for GIFs, Tk reads the base64 text itself, so decoding it now would
+    # only be thrown away; images the editor's photo pool already holds at
+    # these bounds are not rendered from the preview either.
+    if block.mime == _GIF_MIME or not _load_pil() or (block.mime, digest, *bounds) in pooled:
+        return
+    try:
+        block.preview = (*bounds, _load_preview_image(block, *bounds, raw))
+    except Exception:
+        # Left for the renderer, which reports the problem itself.
+        pass
+
+
 def _skip_gif_sub_blocks(data: bytes, pos: int) -> int:
     """Advance ``pos`` past a sequence of GIF sub-blocks."""
 
@@ -230,6 +478,10 @@ def _gif_delays_from_bytes(data: bytes, frame_count: int) -> list[int]:
     return delays
 
 
+# Builds a page from ``(parent, controller)``; the page classes themselves.
+_PageFactory = Callable[[tk.Widget, "ShopotApp"], ttk.Frame]
+
+
 class ShopotApp(tk.Tk):
     """Main Tkinter application window."""
 
@@ -237,49 +489,141 @@ class ShopotApp(tk.Tk):
         super().__init__()
         self.title("Shopot File Viewer")
         self.geometry("900x600")
+        # Key derivation and encryption run here so PBKDF2 does not freeze the
+        # UI; a single worker keeps saves to the same path in order.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shopot")
+        self._pending_jobs = 0
 
         container = ttk.Frame(self)
         container.pack(fill="both", expand=True)
         container.rowconfigure(0, weight=1)
         container.columnconfigure(0, weight=1)
 
-        self.frames: dict[str, tk.Frame] = {}
-        for FrameClass in (HomePage, DocumentEditorPage, KeyArrayPage):
-            frame = FrameClass(parent=container, controller=self)
-            frame.grid(row=0, column=0, sticky="nsew")
-            self.frames[FrameClass.__name__] = frame
+        self._container = container
+        self.frames: dict[str, ttk.Frame] = {}
+        self._build_frame("HomePage", HomePage)
 
         self.show_frame("HomePage")
+        self.after_idle(self._preload_file_dialog)
 
     def show_frame(self, name: str) -> None:
-        frame = self.frames[name]
-        frame.tkraise()
+        self._frame(name).tkraise()
+
+    def _frame(self, name: str) -> ttk.Frame:
+        frame = self.frames.get(name)
+        if frame is None:
+            # Pages other than the home page are built the first time they
+            # are needed, which keeps their widgets out of start-up.
+            frame = self._build_frame(name, _LAZY_FRAME_CLASSES[name])
+        return frame
+
+    def _editor(self) -> "DocumentEditorPage":
+        return cast(DocumentEditorPage, self._frame("DocumentEditorPage"))
+
+    def _build_frame(self, name: str, factory: _PageFactory) -> ttk.Frame:
+        frame = factory(self._container, self)
+        frame.grid(row=0, column=0, sticky="nsew")
+        self.frames[name] = frame
+        return frame
+
+    def _preload_file_dialog(self) -> None:
+        # On X11 the Tk file dialog is a Tcl script sourced on first use;
+        # loading it once the window is idle keeps that off the first click.
+        # Windows and macOS use native dialogs, so the script would only be
+        # sourced for nothing there.
+        if self.tk.call("tk", "windowingsystem") != "x11":
+            return
+        try:
+            self.tk.call("auto_load", "::tk::dialog::file::")
+        except tk.TclError:
+            pass
+
+    def destroy(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        clear_key_cache()
+        super().destroy()
+
+    def run_in_background(
+        self,
+        func: Callable[[], _T],
+        on_success: Callable[[_T], None],
+        on_error: Callable[[Exception], None],
+    ) -> None:
+        """Run ``func`` on the worker thread and report back on the Tk thread."""
+
+        future = self._executor.submit(func)
+        self._pending_jobs += 1
+        if self._pending_jobs == 1:
+            self.configure(cursor="watch")
+        self.after(BACKGROUND_POLL_MS, self._poll_background, future, on_success, on_error)
+
+    def _poll_background(
+        self,
+        future: Future[_T],
+        on_success: Callable[[_T], None],
+        on_error: Callable[[Exception], None],
+    ) -> None:
+        if not future.done():
+            self.after(BACKGROUND_POLL_MS, self._poll_background, future, on_success, on_error)
+            return
+        self._pending_jobs -= 1
+        if self._pending_jobs == 0:
+            self.configure(cursor="")
+        exc = future.exception()
+        if exc is not None:
+            on_error(cast(Exception, exc))
+            return
+        on_success(future.result())
 
     # Navigation helpers -------------------------------------------------
     def open_document_flow(self) -> None:
         doc_path = filedialog.askopenfilename(
             title="Open Shopot document",
-            filetypes=[("Shopot Document", "*.shpt"), ("All Files", "*")],
+            filetypes=_DOCUMENT_FILETYPES,
         )
         if not doc_path:
             return
         key_context = self._prompt_for_key_context()
         if key_context is None:
             return
-        try:
+        editor = self._editor()
+        # A freshly built editor has no geometry until Tk lays it out.
+        editor.update_idletasks()
+        bounds = editor.image_bounds()
+        pooled = editor.pooled_photo_keys()
+
+        def load() -> tuple[ShopotDocument, list[tuple[str, str | ImageBlockData]], str]:
             key_material = password_to_key_material(key_context.password, key_context.key_array)
             document = ShopotDocument.load(doc_path, key_material)
-        except Exception as exc:
+            segments = _parse_document_text(document.text)
+            _prepare_images(segments, bounds, pooled)
+            return document, segments, key_material
+
+        def on_error(exc: Exception) -> None:
             messagebox.showerror("Failed to open", str(exc), parent=self)
-            return
-        editor = cast(DocumentEditorPage, self.frames["DocumentEditorPage"])
+
+        self.run_in_background(
+            load, lambda loaded: self._show_loaded_document(*loaded, doc_path, key_context), on_error
+        )
+
+    def _show_loaded_document(
+        self,
+        document: ShopotDocument,
+        segments: list[tuple[str, str | ImageBlockData]],
+        key_material: str,
+        doc_path: str,
+        key_context: "KeyContext",
+    ) -> None:
+        editor = self._editor()
         try:
             editor.display_document(
                 text=document.text,
+                segments=segments,
                 document_path=doc_path,
                 key_array=key_context.key_array,
                 key_path=key_context.key_path,
                 password=key_context.password,
+                key_material=key_material,
             )
         except Exception as exc:
             messagebox.showerror("Display failed", str(exc), parent=self)
@@ -287,7 +631,7 @@ class ShopotApp(tk.Tk):
         self.show_frame("DocumentEditorPage")
 
     def create_new_document(self) -> None:
-        editor = cast(DocumentEditorPage, self.frames["DocumentEditorPage"])
+        editor = self._editor()
         editor.display_document(text="", document_path=None, key_array=None, key_path=None, password=None)
         self.show_frame("DocumentEditorPage")
 
@@ -298,7 +642,7 @@ class ShopotApp(tk.Tk):
     def _prompt_for_key_context(self) -> "KeyContext | None":
         key_path = filedialog.askopenfilename(
             title="Select key array",
-            filetypes=[("Shopot Key Array", "*.shptk"), ("All Files", "*")],
+            filetypes=_KEY_ARRAY_FILETYPES,
         )
         if not key_path:
             return None
@@ -351,6 +695,9 @@ class HomePage(ttk.Frame):
 class DocumentEditorPage(ttk.Frame):
     MAX_IMAGE_WIDTH = 600
     MAX_IMAGE_HEIGHT = 400
+    # Unused pooled photos kept after a render, so reopening a recent
+    # document does not decode its images again.
+    SPARE_PHOTOS = 8
 
     def __init__(self, parent: tk.Widget, controller: ShopotApp) -> None:
         super().__init__(parent)
@@ -360,17 +707,30 @@ class DocumentEditorPage(ttk.Frame):
         self.current_key_path: str | None = None
         self.current_password: str | None = None
         self.key_array: KeyArray | None = None
+        # Derived from current_password and key_array whenever either is set,
+        # so repeated saves do not walk the key array again.
+        self._key_material: str | None = None
+        # Bumped whenever a different document is displayed, so background
+        # saves can tell whether the editor still shows what they wrote.
+        self._document_generation = 0
         self._image_widgets: dict[str, ImageWidget] = {}
-        self._refresh_pending = False
+        self._photo_pool: dict[_PhotoKey, _PhotoEntry] = {}
+        self._refresh_job: str | None = None
         self._suspend_tag_refresh = False
+        self._dirty_lines: tuple[int, int] | None = None
+        self._edit_anchor: tuple[int, int] | None = None
 
         toolbar = ttk.Frame(self)
         toolbar.pack(fill="x")
 
         ttk.Button(toolbar, text="Back", command=lambda: controller.show_frame("HomePage")).pack(side="left", padx=5, pady=5)
         ttk.Button(toolbar, text="Open", command=controller.open_document_flow).pack(side="left", padx=5)
-        ttk.Button(toolbar, text="Save", command=self.save_document).pack(side="left", padx=5)
-        ttk.Button(toolbar, text="Save As", command=self.save_document_as).pack(side="left", padx=5)
+        self._save_buttons = (
+            ttk.Button(toolbar, text="Save", command=self.save_document),
+            ttk.Button(toolbar, text="Save As", command=self.save_document_as),
+        )
+        for button in self._save_buttons:
+            button.pack(side="left", padx=5)
         ttk.Button(toolbar, text="Set Key", command=self.set_key_context).pack(side="left", padx=5)
 
         format_toolbar = ttk.Frame(self)
@@ -412,19 +772,19 @@ class DocumentEditorPage(ttk.Frame):
         heading1_size = max(base_size + 6, int(base_size * 1.6))
         heading2_size = max(base_size + 4, int(base_size * 1.4))
 
+        # Headings are already bold, so their italic and bold-italic variants
+        # render identically and share one font.
         self._heading1_font = base_font.copy()
         self._heading1_font.configure(size=heading1_size, weight="bold")
         self._heading1_italic_font = self._heading1_font.copy()
         self._heading1_italic_font.configure(slant="italic")
-        self._heading1_bolditalic_font = self._heading1_font.copy()
-        self._heading1_bolditalic_font.configure(slant="italic")
+        self._heading1_bolditalic_font = self._heading1_italic_font
 
         self._heading2_font = base_font.copy()
         self._heading2_font.configure(size=heading2_size, weight="bold")
         self._heading2_italic_font = self._heading2_font.copy()
         self._heading2_italic_font.configure(slant="italic")
-        self._heading2_bolditalic_font = self._heading2_font.copy()
-        self._heading2_bolditalic_font.configure(slant="italic")
+        self._heading2_bolditalic_font = self._heading2_italic_font
 
         self.text_widget.tag_configure("italic", font=self._italic_font)
         self.text_widget.tag_configure("bold", font=self._bold_font)
@@ -466,21 +826,69 @@ class DocumentEditorPage(ttk.Frame):
         }
 
         self.text_widget.bind("<<Modified>>", self._on_text_modified)
+        for sequence in ("<KeyPress>", "<<Cut>>", "<<Paste>>"):
+            self.text_widget.bind(sequence, self._note_edit_anchor, add="+")
+        self.text_widget.bind("<<PasteSelection>>", self._note_paste_selection_anchor, add="+")
         self.text_widget.edit_modified(False)
 
+    def _line_number(self, index: str) -> int:
+        return int(self.text_widget.index(index).split(".", 1)[0])
+
+    def _note_edit_anchor(self, _event: tk.Event[tk.Widget] | None) -> None:
+        # Remember where an edit may start so the lines it replaces (such as a
+        # selection typed over or pasted over) are retagged afterwards.
+        lines = [self._line_number("insert")]
+        if self.text_widget.tag_ranges("sel"):
+            lines.append(self._line_number("sel.first"))
+            lines.append(self._line_number("sel.last"))
+        self._edit_anchor = (min(lines), max(lines))
+
+    def _note_paste_selection_anchor(self, event: tk.Event[tk.Widget]) -> None:
+        # Middle-click pastes at the pointer; this binding runs before the
+        # class binding moves ``insert`` there, so anchor on the pointer.
+        line = self._line_number(f"@{event.x},{event.y}")
+        self._edit_anchor = (line, line)
+
     def _on_text_modified(self, _event: tk.Event[tk.Widget] | None) -> None:
         self.text_widget.edit_modified(False)
         if self._suspend_tag_refresh:
             return
-        if not self._refresh_pending:
-            self._refresh_pending = True
-            self.after_idle(self._refresh_formatting_tags)
+        first = last = self._line_number("insert")
+        if self._edit_anchor is not None:
+            first = min(first, self._edit_anchor[0])
+            last = max(last, self._edit_anchor[1])
+            self._edit_anchor = None
+        if self._dirty_lines is not None:
+            first = min(first, self._dirty_lines[0])
+            last = max(last, self._dirty_lines[1])
+        self._dirty_lines = (first, last)
+        self._cancel_tag_refresh()
+        self._refresh_job = self.after(TAG_REFRESH_DELAY_MS, self._refresh_dirty_lines)
+
+    def _cancel_tag_refresh(self) -> None:
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+
+    def _refresh_dirty_lines(self) -> None:
+        self._refresh_job = None
+        dirty = self._dirty_lines
+        self._dirty_lines = None
+        if self._suspend_tag_refresh or dirty is None:
+            return
+        first, last = dirty
+        self._retag_lines(first, last)
 
     def _refresh_formatting_tags(self) -> None:
-        self._refresh_pending = False
+        self._cancel_tag_refresh()
+        self._dirty_lines = None
         if self._suspend_tag_refresh:
             return
+        self._retag_lines(1)
 
+    def _retag_lines(self, first: int, last: int | None = None) -> None:
+        start = f"{first}.0"
+        end = "end-1c" if last is None else f"{last}.0 lineend"
         tags_to_clear = (
             "italic",
             "bold",
@@ -493,56 +901,57 @@ class DocumentEditorPage(ttk.Frame):
             "heading2_bolditalic",
         )
         for tag in tags_to_clear:
-            self.text_widget.tag_remove(tag, "1.0", tk.END)
+            self.text_widget.tag_remove(tag, start, end)
 
-        index = "1.0"
-        while True:
-            if self.text_widget.compare(index, ">=", "end"):
-                break
-            line_start = index
-            line_end = self.text_widget.index(f"{line_start} lineend")
-            line_text = self.text_widget.get(line_start, line_end)
+        # ``get`` leaves embedded windows out of the returned string, so column
+        # offsets are only trusted on lines without an image.
+        window_lines = {
+            int(index.split(".", 1)[0])
+            for _, _, index in self.text_widget.dump(start, end, window=True)
+        }
+        text = self.text_widget.get(start, end)
+
+        pending: dict[str, list[str]] = {}
+        for line_number, line_text in enumerate(text.split("\n"), start=first):
+            if not line_text:
+                continue
 
             heading_level = 0
-            stripped = line_text.lstrip()
-            if stripped.startswith("## "):
+            prefix = line_text.lstrip()[:3]
+            if prefix == "## ":
                 heading_level = 2
-            elif stripped.startswith("# "):
+            elif prefix[:2] == "# ":
                 heading_level = 1
 
             if heading_level:
                 heading_tag = self._inline_tag_mapping[heading_level]["bold"]
-                self.text_widget.tag_add(heading_tag, line_start, line_end)
+                pending.setdefault(heading_tag, []).extend((f"{line_number}.0", f"{line_number}.end"))
 
-            if line_text and "\uFFFC" not in line_text:
-                self._apply_inline_markers(line_start, line_text, heading_level)
+            if line_number not in window_lines:
+                self._collect_inline_markers(pending, line_number, line_text, heading_level)
 
-            next_index = self.text_widget.index(f"{line_end}+1c")
-            if self.text_widget.compare(next_index, "<=", line_start):
-                break
-            index = next_index
-
-    def _apply_inline_markers(self, line_start: str, line_text: str, heading_level: int) -> None:
-        for match in _BOLD_ITALIC_PATTERN.finditer(line_text):
-            self._apply_inline_tag("bolditalic", heading_level, line_start, match.start(1), match.end(1))
-        for match in _BOLD_PATTERN.finditer(line_text):
-            self._apply_inline_tag("bold", heading_level, line_start, match.start(1), match.end(1))
-        for match in _ITALIC_PATTERN.finditer(line_text):
-            self._apply_inline_tag("italic", heading_level, line_start, match.start(1), match.end(1))
-
-    def _apply_inline_tag(
-        self, kind: str, heading_level: int, line_start: str, start_offset: int, end_offset: int
+        # Tk's ``tag add`` accepts any number of index pairs, so each tag is
+        # applied with a single Tcl call instead of one call per match.
+        for tag, indices in pending.items():
+            self.text_widget.tag_add(tag, *indices)
+
+    def _collect_inline_markers(
+        self, pending: dict[str, list[str]], line_number: int, line_text: str, heading_level: int
     ) -> None:
-        tag_name = self._inline_tag_mapping.get(heading_level, {}).get(kind)
-        if not tag_name:
+        if "*" not in line_text:
             return
-        if start_offset >= end_offset:
-            return
-        start_index = f"{line_start}+{start_offset}c"
-        end_index = f"{line_start}+{end_offset}c"
-        if self.text_widget.compare(start_index, ">=", end_index):
-            return
-        self.text_widget.tag_add(tag_name, start_index, end_index)
+        tag_mapping = self._inline_tag_mapping.get(heading_level, {})
+        for kind, pattern in _INLINE_PATTERNS:
+            tag_name = tag_mapping.get(kind)
+            if not tag_name:
+                continue
+            for match in pattern.finditer(line_text):
+                start_offset, end_offset = match.span(1)
+                if start_offset >= end_offset:
+                    continue
+                pending.setdefault(tag_name, []).extend(
+                    (f"{line_number}.{start_offset}", f"{line_number}.{end_offset}")
+                )
 
     def display_document(
         self,
@@ -552,12 +961,16 @@ class DocumentEditorPage(ttk.Frame):
         key_array: KeyArray | None,
         key_path: str | None,
         password: str | None,
+        segments: list[tuple[str, str | ImageBlockData]] | None = None,
+        key_material: str | None = None,
     ) -> None:
-        self._render_document_text(text)
+        self._render_document_text(text, segments)
+        self._document_generation += 1
         self.current_document_path = document_path
         self.key_array = key_array
         self.current_key_path = key_path
         self.current_password = password
+        self._key_material = key_material
         if document_path:
             status = f"Editing: {Path(document_path).name}"
         else:
@@ -570,23 +983,30 @@ class DocumentEditorPage(ttk.Frame):
     def set_key_context(self) -> None:
         key_path = filedialog.askopenfilename(
             title="Select key array",
-            filetypes=[("Shopot Key Array", "*.shptk"), ("All Files", "*")],
+            filetypes=_KEY_ARRAY_FILETYPES,
         )
         if not key_path:
             return
         password = _prompt_password(self)
         if password is None:
             return
-        try:
+
+        def load() -> tuple[KeyArray, str]:
             key_array = KeyArray.load(key_path)
-            password_to_key_material(password, key_array)
-        except Exception as exc:
+            return key_array, password_to_key_material(password, key_array)
+
+        def on_success(loaded: tuple[KeyArray, str]) -> None:
+            key_array, key_material = loaded
+            self.key_array = key_array
+            self.current_key_path = key_path
+            self.current_password = password
+            self._key_material = key_material
+            self.status_var.set(f"Key loaded: {Path(key_path).name}")
+
+        def on_error(exc: Exception) -> None:
             messagebox.showerror("Invalid key", str(exc), parent=self)
-            return
-        self.key_array = key_array
-        self.current_key_path = key_path
-        self.current_password = password
-        self.status_var.set(f"Key loaded: {Path(key_path).name}")
+
+        self.controller.run_in_background(load, on_success, on_error)
 
     # Saving -------------------------------------------------------------
     def save_document(self) -> None:
@@ -599,46 +1019,73 @@ class DocumentEditorPage(ttk.Frame):
         path = filedialog.asksaveasfilename(
             title="Save Shopot document",
             defaultextension=".shpt",
-            filetypes=[("Shopot Document", "*.shpt"), ("All Files", "*")],
+            filetypes=_DOCUMENT_FILETYPES,
         )
         if not path:
             return
-        self._perform_save(path)
+        self._perform_save(path, on_saved=self._on_saved_as)
+
+    def _on_saved_as(self, path: str) -> None:
         self.current_document_path = path
-        self.status_var.set(f"Saved: {Path(path).name}")
 
-    def _perform_save(self, path: str) -> None:
+    def _perform_save(self, path: str, on_saved: Callable[[str], None] | None = None) -> None:
         if self.key_array is None or self.current_password is None:
             messagebox.showwarning("Missing key", "Please set a key array and password before saving.", parent=self)
             return
         try:
-            key_material = password_to_key_material(self.current_password, self.key_array)
             document_text = self._serialize_document_text()
-            document = ShopotDocument(text=document_text)
-            document.save(path, key_material)
         except Exception as exc:
             messagebox.showerror("Save failed", str(exc), parent=self)
+            return
+        password = self.current_password
+        key_array = self.key_array
+        cached_material = self._key_material
+        previous_status = self.status_var.get()
+        generation = self._document_generation
+
+        def save() -> str:
+            key_material = cached_material or password_to_key_material(password, key_array)
+            ShopotDocument(text=document_text).save(path, key_material)
+            return key_material
+
+        def on_success(key_material: str) -> None:
+            self._set_save_pending(False)
+            if self.key_array is key_array and self.current_password == password:
+                self._key_material = key_material
+            # Another document may have been opened or created meanwhile; the
+            # path and status belong to the document that was saved.
+            if generation != self._document_generation:
+                return
+            self.status_var.set(f"Saved: {Path(path).name}")
+            if on_saved is not None:
+                on_saved(path)
+
+        def on_error(exc: Exception) -> None:
+            self._set_save_pending(False)
+            if generation == self._document_generation:
+                self.status_var.set(previous_status)
+            messagebox.showerror("Save failed", str(exc), parent=self)
+
+        # The editor stays usable while the worker saves, but a second save
+        # cannot be started until this one has finished.
+        self._set_save_pending(True)
+        self.status_var.set(f"Saving {Path(path).name}...")
+        self.controller.run_in_background(save, on_success, on_error)
+
+    def _set_save_pending(self, pending: bool) -> None:
+        state = "disabled" if pending else "normal"
+        for button in self._save_buttons:
+            button.configure(state=state)
 
     # Image helpers -----------------------------------------------------
     def add_image(self) -> None:
         path = filedialog.askopenfilename(
             title="Select image",
-            filetypes=[
-                (
-                    "Image files",
-                    "*.png *.gif *.jpg *.jpeg *.webp *.heic *.heif",
-                ),
-                ("PNG", "*.png"),
-                ("GIF", "*.gif"),
-                ("JPEG", "*.jpg *.jpeg"),
-                ("WebP", "*.webp"),
-                ("HEIC/HEIF", "*.heic *.heif"),
-                ("All Files", "*"),
-            ],
+            filetypes=_IMAGE_FILETYPES,
         )
         if not path:
             return
-        mime, _ = mimetypes.guess_type(path)
+        mime = _guess_image_mime(Path(path).suffix)
         if mime and mime not in _SUPPORTED_IMAGE_MIMES:
             messagebox.showerror(
                 "Unsupported image",
@@ -646,28 +1093,39 @@ class DocumentEditorPage(ttk.Frame):
                 parent=self,
             )
             return
-        try:
+        bounds = self.image_bounds()
+        pooled = self.pooled_photo_keys()
+
+        def load() -> ImageBlockData:
             data = Path(path).read_bytes()
-        except OSError as exc:
+            block = ImageBlockData(mime=mime or self._detect_mime_from_bytes(data), data="", caption="Image caption")
+            if block.mime in _SUPPORTED_IMAGE_MIMES:
+                block.data = _b64encode_text(data)
+                # The preview is built from the file bytes, so the payload
+                # that was just encoded is not decoded again.
+                _prepare_image_block(block, bounds, data, pooled=pooled)
+            return block
+
+        def on_error(exc: Exception) -> None:
             messagebox.showerror("Failed to read image", str(exc), parent=self)
-            return
-        mime = mime or self._detect_mime_from_bytes(data)
-        if mime not in _SUPPORTED_IMAGE_MIMES:
+
+        self.controller.run_in_background(load, self._insert_loaded_image, on_error)
+
+    def _insert_loaded_image(self, block: ImageBlockData) -> None:
+        if block.mime not in _SUPPORTED_IMAGE_MIMES:
             messagebox.showerror(
                 "Unsupported image",
                 "Only PNG, GIF, JPEG, WebP, and HEIC/HEIF images are supported for embedding.",
                 parent=self,
             )
             return
-        if mime in (_STATIC_IMAGE_MIMES - {"image/png"}) and (not _PIL_AVAILABLE or Image is None):
+        if block.mime in (_STATIC_IMAGE_MIMES - {"image/png"}) and not _load_pil():
             messagebox.showerror(
                 "Missing dependency",
                 "Displaying JPEG, WebP, and HEIC/HEIF images requires Pillow. Install Pillow to embed this format.",
                 parent=self,
             )
             return
-        encoded = base64.b64encode(data).decode("ascii")
-        block = ImageBlockData(mime=mime, data=encoded, caption="Image caption")
         try:
             self._suspend_tag_refresh = True
             self._insert_image_widget(block, self.text_widget.index("insert"))
@@ -677,64 +1135,46 @@ class DocumentEditorPage(ttk.Frame):
             self._suspend_tag_refresh = False
         self._refresh_formatting_tags()
 
-    def _render_document_text(self, text: str) -> None:
+    def _render_document_text(
+        self, text: str, segments: list[tuple[str, str | ImageBlockData]] | None = None
+    ) -> None:
         self._suspend_tag_refresh = True
         try:
             self.text_widget.configure(state="normal")
             self._clear_registered_images()
             self.text_widget.delete("1.0", tk.END)
-            segments = self._parse_document_text(text)
+            if segments is None:
+                segments = _parse_document_text(text)
+            # Runs of text between images go in with one insert each. Every
+            # image lands at the end of the text, where _normalize_image_index
+            # always resolves to the end position itself, so the window is
+            # created there directly and its trailing newline simply joins
+            # the next text run.
+            pending: list[str] = []
             for kind, payload in segments:
                 if kind == "text":
-                    if payload:
-                        self.text_widget.insert(tk.END, payload)
+                    pending.append(cast(str, payload))
                 elif kind == "image":
-                    self._insert_image_widget(payload, self.text_widget.index(tk.END))
+                    if pending:
+                        self._insert_text_run(pending)
+                    widget = self._create_image_frame(cast(ImageBlockData, payload))
+                    self.text_widget.window_create(tk.END, window=widget.frame)
+                    pending.append("\n")
+            if pending:
+                self._insert_text_run(pending)
             self.text_widget.mark_set("insert", tk.END)
             self.text_widget.focus_set()
         finally:
             self._suspend_tag_refresh = False
+            self._prune_photo_pool()
         self._refresh_formatting_tags()
         self.text_widget.edit_modified(False)
 
-    def _parse_document_text(self, text: str) -> list[tuple[str, str | ImageBlockData]]:
-        segments: list[tuple[str, str | ImageBlockData]] = []
-        pos = 0
-        while True:
-            start = text.find(IMAGE_HEADER_PREFIX, pos)
-            if start == -1:
-                remaining = text[pos:]
-                if remaining:
-                    segments.append(("text", remaining))
-                break
-            before = text[pos:start]
-            if before:
-                segments.append(("text", before))
-            header_end = text.find("\n", start)
-            if header_end == -1:
-                segments.append(("text", text[start:]))
-                break
-            header_line = text[start:header_end]
-            data_start = header_end + 1
-            footer_token = "\n" + IMAGE_FOOTER
-            footer_pos = text.find(footer_token, data_start)
-            if footer_pos == -1:
-                segments.append(("text", text[start:]))
-                break
-            data = text[data_start:footer_pos]
-            block_end = footer_pos + len(footer_token)
-            trailing_newline = block_end < len(text) and text[block_end] == "\n"
-            if trailing_newline:
-                block_end += 1
-            pos = block_end
-            block = _parse_image_header(header_line)
-            if block is None:
-                raw = text[start:pos]
-                segments.append(("text", raw))
-                continue
-            block.data = data.strip()
-            segments.append(("image", block))
-        return segments
+    def _insert_text_run(self, pending: list[str]) -> None:
+        text = "".join(pending)
+        pending.clear()
+        if text:
+            self.text_widget.insert(tk.END, text)
 
     def _insert_image_widget(self, block: ImageBlockData, index: str) -> None:
         index = self._normalize_image_index(index)
@@ -768,7 +1208,7 @@ class DocumentEditorPage(ttk.Frame):
     def _create_image_frame(self, block: ImageBlockData) -> ImageWidget:
         frame = ttk.Frame(self.text_widget)
         try:
-            photo, frames, delays = self._create_photo_image(block)
+            pool_key, (photo, frames, delays) = self._pooled_photo_image(block)
         except tk.TclError as exc:
             raise RuntimeError(f"Unable to display image: {exc}")
         image_label = ttk.Label(frame, image=photo)
@@ -790,13 +1230,14 @@ class DocumentEditorPage(ttk.Frame):
             block=block,
             frames=frames,
             delays=delays,
+            pool_key=pool_key,
         )
         self._image_widgets[str(frame)] = widget
         self._start_image_animation(widget)
         return widget
 
     def _detect_mime_from_bytes(self, data: bytes) -> str:
-        if not _PIL_AVAILABLE or Image is None:
+        if not _load_pil():
             return "application/octet-stream"
         try:
             with Image.open(io.BytesIO(data)) as image:
@@ -809,14 +1250,52 @@ class DocumentEditorPage(ttk.Frame):
             pass
         return "application/octet-stream"
 
-    def _create_photo_image(
-        self, block: ImageBlockData
-    ) -> tuple[tk.PhotoImage, list[tk.PhotoImage] | None, list[int] | None]:
+    def image_bounds(self) -> tuple[int, int]:
+        """Return the ``(max_width, max_height)`` embedded images are scaled to fit."""
+
         widget_width = self.text_widget.winfo_width() or 800
         widget_height = self.text_widget.winfo_height() or 600
         max_width = min(self.MAX_IMAGE_WIDTH, max(250, int(widget_width * 0.6)))
         max_height = min(self.MAX_IMAGE_HEIGHT, max(250, int(widget_height * 0.6)))
+        return max_width, max_height
+
+    def pooled_photo_keys(self) -> frozenset[_PhotoKey]:
+        """Return the keys of the Tk photos currently kept for reuse."""
+
+        return frozenset(self._photo_pool)
+
+    def _pooled_photo_image(self, block: ImageBlockData) -> tuple[_PhotoKey, _PhotoEntry]:
+        # Re-rendering a document shows the same images again; reuse the Tk
+        # photos already decoded for them instead of allocating new ones.
+        max_width, max_height = self.image_bounds()
+        key = (block.mime, block.payload_digest(), max_width, max_height)
+        # Popping and re-inserting keeps the pool ordered by last use.
+        entry = self._photo_pool.pop(key, None)
+        if entry is None:
+            entry = self._create_photo_image(block, max_width, max_height)
+        else:
+            # The block stays on its widget until the document is closed;
+            # do not keep a scaled image nothing will read.
+            block.preview = None
+        self._photo_pool[key] = entry
+        return key, entry
+
+    def _prune_photo_pool(self) -> None:
+        live = {widget.pool_key for widget in self._image_widgets.values()}
+        unused = [key for key in self._photo_pool if key not in live]
+        for key in unused[: max(0, len(unused) - self.SPARE_PHOTOS)]:
+            photo, frames, _ = self._photo_pool.pop(key)
+            # Delete the Tk images now rather than whenever the last Python
+            # reference happens to be collected.
+            for image in {photo, *(frames or ())}:
+                try:
+                    self.tk.call("image", "delete", str(image))
+                except tk.TclError:
+                    pass
 
+    def _create_photo_image(
+        self, block: ImageBlockData, max_width: int, max_height: int
+    ) -> _PhotoEntry:
         if block.mime == _GIF_MIME:
             base_photo = tk.PhotoImage(data=block.data)
             width = base_photo.width()
@@ -824,70 +1303,46 @@ class DocumentEditorPage(ttk.Frame):
             scale = max(width / max_width if max_width else 1, height / max_height if max_height else 1)
             subsample_factor = max(1, math.ceil(scale)) if scale > 1 else 1
             photo = base_photo if subsample_factor == 1 else base_photo.subsample(subsample_factor, subsample_factor)
-            frames, delays = self._load_gif_frames(block.data, subsample_factor)
+            frames, delays = self._load_gif_frames(block, subsample_factor)
             if frames:
                 photo = frames[0]
             return photo, frames, delays
 
+        if _load_pil():
+            # Pillow scales straight to the target size, so only the final
+            # thumbnail becomes a Tk image and it is filtered, not subsampled.
+            return self._create_pil_photo_image(block, max_width, max_height), None, None
+
         try:
             base_photo = tk.PhotoImage(data=block.data)
         except tk.TclError:
-            base_photo = None
-
-        if base_photo is not None:
-            width = base_photo.width()
-            height = base_photo.height()
-            scale = max(width / max_width if max_width else 1, height / max_height if max_height else 1)
-            subsample_factor = max(1, math.ceil(scale)) if scale > 1 else 1
-            photo = base_photo if subsample_factor == 1 else base_photo.subsample(subsample_factor, subsample_factor)
-            return photo, None, None
-
-        if not _PIL_AVAILABLE or Image is None or ImageTk is None:
             raise RuntimeError(
                 "Displaying this image type requires Pillow. Install Pillow to enable JPEG, WebP, or HEIC/HEIF support."
             )
 
-        try:
-            raw = base64.b64decode(block.data.encode("ascii"))
-        except Exception as exc:  # pragma: no cover - malformed base64
-            raise RuntimeError("Embedded image data is not valid base64.") from exc
-
-        try:
-            image = Image.open(io.BytesIO(raw))
-        except Exception as exc:  # pragma: no cover - unsupported format
-            if block.mime in {"image/heic", "image/heif"}:
-                raise RuntimeError(
-                    "HEIC/HEIF preview requires Pillow with HEIF support (e.g., install pillow-heif)."
-                ) from exc
-            raise RuntimeError(str(exc)) from exc
-
-        try:
-            if ImageOps is not None:
-                image = ImageOps.exif_transpose(image)
-        except Exception:
-            pass
-
-        if image.mode not in {"RGB", "RGBA"}:
-            image = image.convert("RGBA")
-
-        width, height = image.size
+        width = base_photo.width()
+        height = base_photo.height()
         scale = max(width / max_width if max_width else 1, height / max_height if max_height else 1)
-        if scale > 1:
-            new_width = max(1, int(width / scale))
-            new_height = max(1, int(height / scale))
-            image = image.resize((new_width, new_height), Image.LANCZOS)
-
-        photo = ImageTk.PhotoImage(image)
+        subsample_factor = max(1, math.ceil(scale)) if scale > 1 else 1
+        photo = base_photo if subsample_factor == 1 else base_photo.subsample(subsample_factor, subsample_factor)
         return photo, None, None
 
+    def _create_pil_photo_image(self, block: ImageBlockData, max_width: int, max_height: int) -> tk.PhotoImage:
+        preview, block.preview = block.preview, None
+        if preview is not None and preview[:2] == (max_width, max_height):
+            image = preview[2]
+        else:
+            image = _load_preview_image(block, max_width, max_height)
+        return ImageTk.PhotoImage(image)
+
     def _load_gif_frames(
-        self, data: str, subsample_factor: int
+        self, block: ImageBlockData, subsample_factor: int
     ) -> tuple[list[tk.PhotoImage], list[int]]:
         frames: list[tk.PhotoImage] = []
         index = 0
         while True:
             try:
-                frame = tk.PhotoImage(data=data, format=f"gif -index {index}")
+                frame = tk.PhotoImage(data=block.data, format=f"gif -index {index}")
             except tk.TclError:
                 break
             if subsample_factor > 1:
@@ -899,7 +1354,7 @@ class DocumentEditorPage(ttk.Frame):
             return [], []
 
         try:
-            raw = base64.b64decode(data.encode("ascii"))
+            raw = block.decoded()
         except Exception:
             return frames, [100] * len(frames)
 
@@ -941,14 +1396,13 @@ class DocumentEditorPage(ttk.Frame):
     def _clear_registered_images(self) -> None:
         for widget in self._image_widgets.values():
             self._stop_image_animation(widget)
+            widget.frame.destroy()
         self._image_widgets.clear()
 
     def _download_image(self, block: ImageBlockData, caption_var: tk.StringVar) -> None:
         caption = caption_var.get().strip() or "shopot-image"
-        safe_caption = "".join(ch if ch.isalnum() or ch in ("-", "_") else "_" for ch in caption)
-        ext = mimetypes.guess_extension(block.mime) or ".img"
-        if ext == ".jpe":
-            ext = ".jpg"
+        safe_caption = _UNSAFE_FILENAME_CHARS.sub("_", caption)
+        ext = _guess_image_extension(block.mime)
         path = filedialog.asksaveasfilename(
             title="Save image",
             defaultextension=ext,
@@ -958,49 +1412,72 @@ class DocumentEditorPage(ttk.Frame):
         if not path:
             return
         try:
-            data = base64.b64decode(block.data.encode("ascii"))
-            Path(path).write_bytes(data)
+            payload = block.data
+            if _NON_BASE64_CHARS.search(payload):
+                payload = _NON_BASE64_CHARS.sub("", payload)
+            with open(path, "wb") as handle:
+                for offset in range(0, len(payload), _BASE64_CHUNK_CHARS):
+                    chunk = payload[offset : offset + _BASE64_CHUNK_CHARS]
+                    handle.write(_b64decode_data(chunk))
         except Exception as exc:
             messagebox.showerror("Save failed", str(exc), parent=self)
             return
         messagebox.showinfo("Saved", f"Image saved to {path}", parent=self)
 
     def _gather_document_segments(self) -> list[tuple[str, str | ImageBlockData]]:
+        # Fetch the text in one call and only ask dump for the windows; get()
+        # leaves embedded windows out, so each window's column is shifted back
+        # by the windows preceding it on the same line.
+        text = self.text_widget.get("1.0", "end-1c")
+        if not self._image_widgets:
+            return [("text", text)] if text else []
         segments: list[tuple[str, str | ImageBlockData]] = []
-        buffer: list[str] = []
-        for kind, value, _ in self.text_widget.dump("1.0", "end-1c", text=True, window=True):
-            if kind == "text":
-                buffer.append(value)
-            elif kind == "window":
-                if buffer:
-                    segments.append(("text", "".join(buffer)))
-                    buffer.clear()
-                widget = self._image_widgets.get(value)
-                if widget:
-                    block = ImageBlockData(
-                        mime=widget.block.mime,
-                        data=widget.block.data,
-                        caption=widget.caption_var.get().strip(),
-                    )
-                    segments.append(("image", block))
-        if buffer:
-            segments.append(("text", "".join(buffer)))
+        pos = 0
+        line, line_start = 1, 0
+        windows_on_line = 0
+        for _, value, index in self.text_widget.dump("1.0", "end-1c", window=True):
+            window_line, column = map(int, index.split("."))
+            if window_line != line:
+                for _ in range(window_line - line):
+                    line_start = text.index("\n", line_start) + 1
+                line = window_line
+                windows_on_line = 0
+            offset = line_start + column - windows_on_line
+            windows_on_line += 1
+            widget = self._image_widgets.get(value)
+            if not widget:
+                continue
+            if offset > pos:
+                segments.append(("text", text[pos:offset]))
+                pos = offset
+            block = widget.block
+            caption = widget.caption_var.get().strip()
+            if caption != block.caption:
+                block = ImageBlockData(mime=block.mime, data=block.data, caption=caption, digest=block.digest)
+            segments.append(("image", block))
+        if pos < len(text):
+            segments.append(("text", text[pos:]))
         return segments
 
     def _serialize_document_text(self) -> str:
         segments = self._gather_document_segments()
         parts: list[str] = []
+        # The base64 payload is appended as-is so that it is only copied once,
+        # by the final join.
+        ends_with_newline = True
         for kind, payload in segments:
             if kind == "text":
                 parts.append(payload)
+                ends_with_newline = payload.endswith("\n")
                 continue
             block = payload  # type: ignore[assignment]
-            caption = block.caption.replace("\n", " ")
-            block.caption = caption
-            if parts and not parts[-1].endswith("\n"):
+            if "\n" in block.caption:
+                block = ImageBlockData(mime=block.mime, data=block.data, caption=block.caption.replace("\n", " "))
+            if not ends_with_newline:
                 parts.append("\n")
             header = _build_image_header(block)
-            parts.append(f"{header}\n{block.data}\n{IMAGE_FOOTER}\n")
+            parts.extend((header, "\n", block.data, _IMAGE_FOOTER_LINE))
+            ends_with_newline = True
         return "".join(parts)
 
     # Formatting helpers ------------------------------------------------
@@ -1043,47 +1520,60 @@ class DocumentEditorPage(ttk.Frame):
         self._refresh_formatting_tags()
 
     def _wrap_selection(self, marker: str) -> None:
-        try:
-            start = self.text_widget.index("sel.first")
-            end = self.text_widget.index("sel.last")
-        except tk.TclError:
+        # One ``tag ranges`` call instead of indexing sel.first and sel.last.
+        ranges = self.text_widget.tag_ranges("sel")
+        if not ranges:
             messagebox.showinfo("No selection", "Highlight text before applying formatting.", parent=self)
             return
+        start, end = str(ranges[0]), str(ranges[-1])
 
         if self._selection_contains_window(start, end):
             messagebox.showinfo("Invalid selection", "Formatting cannot span embedded images.", parent=self)
             return
 
-        selected_text = self.text_widget.get(start, end)
-        prefix = marker
-        suffix = marker
-        wrapped = f"{prefix}{selected_text}{suffix}"
-
+        # Only the markers are inserted; the selected text itself is never
+        # copied out of and back into the widget. The end marker goes in
+        # first so that ``start`` still points at the selection start.
         self._suspend_tag_refresh = True
         try:
-            self.text_widget.delete(start, end)
-            self.text_widget.insert(start, wrapped)
+            self.text_widget.insert(end, marker)
+            self.text_widget.insert(start, marker)
         finally:
             self._suspend_tag_refresh = False
 
-        self.text_widget.tag_remove("sel", "1.0", tk.END)
-        self.text_widget.tag_add("sel", start, f"{start}+{len(wrapped)}c")
+        first_line = int(start.split(".", 1)[0])
+        last_line = int(end.split(".", 1)[0])
+        # ``end`` moved with the start marker only if both are on one line.
+        shift = 2 * len(marker) if first_line == last_line else len(marker)
+        # Text inserted at a tag boundary does not inherit the tag, so "sel"
+        # still covers exactly the original text and only has to be widened
+        # over the markers; it never reaches outside the new range.
+        self.text_widget.tag_add("sel", start, f"{end}+{shift}c")
         self.text_widget.focus_set()
-        self._refresh_formatting_tags()
+        self._retag_lines(first_line, last_line)
 
     def _selection_contains_window(self, start: str, end: str) -> bool:
-        for kind, _, _ in self.text_widget.dump(start, end, text=False, window=True):
-            if kind == "window":
-                return True
-        return False
+        # Every embedded window is registered in ``_image_widgets``, so an
+        # empty registry means there is nothing for Tk to find.
+        if not self._image_widgets:
+            return False
+        return bool(self.text_widget.dump(start, end, window=True))
 
 
 class KeyArrayPage(ttk.Frame):
+    # Generated layers are ~18 KB; the cap only bites on oversized key files.
+    MAX_DISPLAY_CHARS = 200_000
+
     def __init__(self, parent: tk.Widget, controller: ShopotApp) -> None:
         super().__init__(parent)
         self.controller = controller
         self.key_array: KeyArray | None = None
         self.current_layer = 0
+        self._layer_count = 0
+        # Formatted layers, valid for the key array object they were built from.
+        self._layer_texts: dict[int, str] = {}
+        self._layer_texts_source: KeyArray | None = None
+        self._displayed_text = ""
 
         toolbar = ttk.Frame(self)
         toolbar.pack(fill="x")
@@ -1121,20 +1611,36 @@ class KeyArrayPage(ttk.Frame):
     def load_key_array(self) -> None:
         path = filedialog.askopenfilename(
             title="Open Shopot key array",
-            filetypes=[("Shopot Key Array", "*.shptk"), ("All Files", "*")],
+            filetypes=_KEY_ARRAY_FILETYPES,
         )
         if not path:
             return
-        try:
-            self.key_array = KeyArray.load(path)
-        except Exception as exc:
+
+        def on_error(exc: Exception) -> None:
             messagebox.showerror("Failed to load", str(exc), parent=self)
-            return
-        self.current_layer = 0
-        self._refresh_layer_display()
+
+        self.controller.run_in_background(
+            lambda: self._prepare_key_array(KeyArray.load(path)), self._show_key_array, on_error
+        )
 
     def generate_key_array(self) -> None:
-        self.key_array = KeyArray.generate()
+        def on_error(exc: Exception) -> None:
+            messagebox.showerror("Failed to generate", str(exc), parent=self)
+
+        self.controller.run_in_background(
+            lambda: self._prepare_key_array(KeyArray.generate()), self._show_key_array, on_error
+        )
+
+    @staticmethod
+    def _prepare_key_array(key_array: KeyArray) -> tuple[KeyArray, dict[int, str]]:
+        # Runs on the worker thread: format every layer up front so paging
+        # through them only has to swap the widget text.
+        return key_array, {index: key_array.as_text(index) for index in range(len(key_array.layers))}
+
+    def _show_key_array(self, prepared: tuple[KeyArray, dict[int, str]]) -> None:
+        self.key_array, self._layer_texts = prepared
+        self._layer_texts_source = self.key_array
+        self._layer_count = len(self.key_array.layers)
         self.current_layer = 0
         self._refresh_layer_display()
 
@@ -1145,24 +1651,34 @@ class KeyArrayPage(ttk.Frame):
         path = filedialog.asksaveasfilename(
             title="Save Shopot key array",
             defaultextension=".shptk",
-            filetypes=[("Shopot Key Array", "*.shptk"), ("All Files", "*")],
+            filetypes=_KEY_ARRAY_FILETYPES,
         )
         if not path:
             return
-        self.key_array.dump(path)
-        messagebox.showinfo("Saved", f"Key array saved to {path}", parent=self)
+        key_array = self.key_array
+
+        def on_success(_result: None) -> None:
+            messagebox.showinfo("Saved", f"Key array saved to {path}", parent=self)
+
+        def on_error(exc: Exception) -> None:
+            messagebox.showerror("Failed to save", str(exc), parent=self)
+
+        self.controller.run_in_background(lambda: key_array.dump(path), on_success, on_error)
 
     # Layer navigation ---------------------------------------------------
     def prev_layer(self) -> None:
-        if self.key_array is None:
-            return
-        self.current_layer = (self.current_layer - 1) % len(self.key_array.layers)
-        self._refresh_layer_display()
+        self._step_layer(-1)
 
     def next_layer(self) -> None:
+        self._step_layer(1)
+
+    def _step_layer(self, step: int) -> None:
         if self.key_array is None:
             return
-        self.current_layer = (self.current_layer + 1) % len(self.key_array.layers)
+        layer = (self.current_layer + step) % self._layer_count
+        if layer == self.current_layer:
+            return
+        self.current_layer = layer
         self._refresh_layer_display()
 
     def _refresh_layer_display(self) -> None:
@@ -1170,19 +1686,36 @@ class KeyArrayPage(ttk.Frame):
             self.layer_label.config(text="No key array loaded")
             self._set_text("")
             return
-        total = len(self.key_array.layers)
-        self.layer_label.config(text=f"Layer {self.current_layer + 1} of {total}")
-        text = self.key_array.as_text(self.current_layer)
+        self.layer_label.config(text=f"Layer {self.current_layer + 1} of {self._layer_count}")
+        if self._layer_texts_source is not self.key_array:
+            self._layer_texts.clear()
+            self._layer_texts_source = self.key_array
+        text = self._layer_texts.get(self.current_layer)
+        if text is None:
+            text = self._layer_texts[self.current_layer] = self.key_array.as_text(self.current_layer)
         self._set_text(text)
 
     def _set_text(self, text: str) -> None:
+        # Reloading the same key file formats identical layers; leave the
+        # widget alone rather than rebuilding its contents.
+        if text == self._displayed_text:
+            return
+        self._displayed_text = text
+        hidden = len(text) - self.MAX_DISPLAY_CHARS
+        if hidden > 0:
+            text = f"{text[: self.MAX_DISPLAY_CHARS]}\n... (truncated, {hidden} more chars)"
         self.text_widget.configure(state="normal")
-        self.text_widget.delete("1.0", tk.END)
-        self.text_widget.insert("1.0", text)
+        self.text_widget.replace("1.0", tk.END, text)
         self.text_widget.configure(state="disabled")
 
 
-@dataclass(frozen=True)
+_LAZY_FRAME_CLASSES: dict[str, _PageFactory] = {
+    "DocumentEditorPage": DocumentEditorPage,
+    "KeyArrayPage": KeyArrayPage,
+}
+
+
+@dataclass(frozen=True, slots=True)
 class KeyContext:
     key_array: KeyArray
     password: str
@@ -4,6 +4,7 @@ from __future__ import annotations
 import json
 import os
 import random
+import secrets
 import string
 from dataclasses import dataclass
 from pathlib import Path
@@ -24,26 +25,32 @@ class KeyArray:
 
     @classmethod
     def generate(cls, *, seed: int | None = None) -> "KeyArray":
-        rng = random.Random(seed)
-        layers: Array3D = []
-        for _ in range(LAYER_COUNT):
-            layer: ArrayLayer = []
-            for _ in range(GRID_SIZE):
-                row = ["".join(rng.choice(CHARACTERS) for _ in range(ELEMENT_LENGTH)) for _ in range(GRID_SIZE)]
-                layer.append(row)
-            layers.append(layer)
+        element_count = LAYER_COUNT * GRID_SIZE * GRID_SIZE
+        if seed is None:
+            characters = _draw_secure_characters(element_count * ELEMENT_LENGTH)
+        else:
+            characters = _draw_characters(random.Random(seed), element_count * ELEMENT_LENGTH)
+        elements = [
+            characters[offset : offset + ELEMENT_LENGTH]
+            for offset in range(0, len(characters), ELEMENT_LENGTH)
+        ]
+        rows = [elements[offset : offset + GRID_SIZE] for offset in range(0, element_count, GRID_SIZE)]
+        layers: Array3D = [rows[offset : offset + GRID_SIZE] for offset in range(0, len(rows), GRID_SIZE)]
         return cls(layers)
 
     @classmethod
     def load(cls, path: str | os.PathLike[str]) -> "KeyArray":
-        data = json.loads(Path(path).read_text())
-        if not isinstance(data, list) or len(data) != LAYER_COUNT:
+        data = json.loads(Path(path).read_bytes())
+        if not _is_layer_stack(data):
             raise ValueError("Invalid key file: unexpected structure")
         return cls(data)  # type: ignore[arg-type]
 
     def dump(self, path: str | os.PathLike[str]) -> None:
         ensure_directory(path)
-        Path(path).write_text(json.dumps(self.layers))
+        Path(path).write_bytes(self.to_bytes())
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(self.layers, separators=(",", ":")).encode("ascii")
 
     def layer(self, index: int) -> ArrayLayer:
         return self.layers[index]
@@ -53,5 +60,71 @@ class KeyArray:
         return "\n".join(" ".join(row) for row in layer)
 
 
+def _is_layer_stack(data: object) -> bool:
+    """Return whether ``data`` is ``LAYER_COUNT`` square grids of strings."""
+
+    if not isinstance(data, list) or len(data) != LAYER_COUNT:
+        return False
+    size = len(data[0]) if isinstance(data[0], list) else 0
+    if size == 0:
+        return False
+    for layer in data:
+        if not isinstance(layer, list) or len(layer) != size:
+            return False
+        for row in layer:
+            if not isinstance(row, list) or len(row) != size or set(map(type, row)) != {str}:
+                return False
+    return True
+
+
+# ``Random.choice`` over the alphabet draws one 32-bit word per attempt and
+# keeps its top ``_CHOICE_BITS`` bits, rejecting values past the alphabet.
+# The tables below replay that per byte: the top byte of each word is mapped
+# to its character, and the rejected values are deleted.
+_CHOICE_BITS = len(CHARACTERS).bit_length()
+_CHOICE_TABLE = bytes(
+    ord(CHARACTERS[byte >> (8 - _CHOICE_BITS)]) if byte >> (8 - _CHOICE_BITS) < len(CHARACTERS) else 0
+    for byte in range(256)
+)
+_CHOICE_REJECTED = bytes(byte for byte in range(256) if byte >> (8 - _CHOICE_BITS) >= len(CHARACTERS))
+
+
+def _draw_characters(rng: random.Random, count: int) -> str:
+    """Return ``count`` characters, identical to ``count`` calls of ``rng.choice(CHARACTERS)``."""
+
+    chunks: list[bytes] = []
+    drawn = 0
+    while drawn < count:
+        # ``getrandbits`` lays consecutive 32-bit words out little-endian, so
+        # byte 3 of every group of four is the top byte of one draw.
+        words = count - drawn + (count - drawn) // 16 + 16
+        raw = rng.getrandbits(32 * words).to_bytes(4 * words, "little")
+        chunk = raw[3::4].translate(_CHOICE_TABLE, _CHOICE_REJECTED)
+        chunks.append(chunk)
+        drawn += len(chunk)
+    return b"".join(chunks)[:count].decode("ascii")
+
+
+# Fresh key arrays draw from the operating system's CSPRNG instead. Bytes
+# from ``_SECURE_LIMIT`` up are rejected so that ``byte % len(CHARACTERS)``
+# stays uniform.
+_SECURE_LIMIT = 256 - 256 % len(CHARACTERS)
+_SECURE_TABLE = bytes(ord(CHARACTERS[byte % len(CHARACTERS)]) for byte in range(256))
+_SECURE_REJECTED = bytes(range(_SECURE_LIMIT, 256))
+
+
+def _draw_secure_characters(count: int) -> str:
+    """Return ``count`` characters drawn uniformly with :mod:`secrets`."""
+
+    chunks: list[bytes] = []
+    drawn = 0
+    while drawn < count:
+        raw = secrets.token_bytes(count - drawn + (count - drawn) // 16 + 16)
+        chunk = raw.translate(_SECURE_TABLE, _SECURE_REJECTED)
+        chunks.append(chunk)
+        drawn += len(chunk)
+    return b"".join(chunks)[:count].decode("ascii")
+
+
 def ensure_directory(path: str | os.PathLike[str]) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
@@ -1,7 +1,7 @@
 """Pattern selection logic for Shopot key arrays."""
 from __future__ import annotations
 
-from typing import Iterable, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Sequence, Tuple
 
 Coordinate = Tuple[int, int]
 Layer = Sequence[Sequence[str]]
@@ -12,11 +12,13 @@ class PatternRegistry:
 
     Each pattern returns a sequence of coordinates (row, column) that should be
     read from the supplied layer. The registry stores callables so that it is
-    trivial to add new patterns in the future.
+    trivial to add new patterns in the future. Patterns depend only on the
+    size of the layer, so their coordinates are computed once per size.
     """
 
     def __init__(self) -> None:
         self._patterns: List = []
+        self._coordinate_cache: Dict[Tuple[int, int], Tuple[Coordinate, ...]] = {}
 
     def register(self, func):
         self._patterns.append(func)
@@ -28,9 +30,13 @@ class PatternRegistry:
         except IndexError as exc:  # pragma: no cover - defensive programming
             raise ValueError(f"Unknown pattern index: {digit}") from exc
 
-    def coordinates(self, digit: int, layer: Layer) -> Iterable[Coordinate]:
-        pattern = self.get(digit)
-        return pattern(layer)
+    def coordinates(self, digit: int, layer: Layer) -> Tuple[Coordinate, ...]:
+        key = (digit, len(layer))
+        cached = self._coordinate_cache.get(key)
+        if cached is None:
+            pattern = self.get(digit)
+            cached = self._coordinate_cache[key] = tuple(pattern(layer))
+        return cached
 
 
 registry = PatternRegistry()